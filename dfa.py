@@ -0,0 +1,49 @@
+import typing as tp
+from dataclasses import dataclass
+
+
+@dataclass
+class DFA:
+    """
+    DFA represents the deterministic finite automaton.
+    States are numbered as 0, ..., len(delta) - 1,
+    delta[state] maps label to the state reached from given state by transition with this label.
+    """
+    start: int
+    accept: tp.Set[int]
+    delta: tp.List[tp.Dict[str, int]]
+
+    def accepts(self, chain: tp.Sequence[str]) -> bool:
+        state = self.start
+        for symbol in chain:
+            state = self.delta[state].get(symbol, -1)
+            if state < 0:
+                return False
+        return state in self.accept
+
+    def accepts_all(self, chains: tp.Sequence[tp.Sequence[str]]) -> tp.List[bool]:
+        """
+        Checks every chain of the batch.
+        Chains are walked in sorted order, so states reached by common prefix of neighbouring chains are reused.
+        """
+        result = [False] * len(chains)
+        path = [self.start]  # path[i] is state after first i symbols of previous chain, -1 if there is none
+        previous: tp.Sequence[str] = ()
+        for ind in sorted(range(len(chains)), key=chains.__getitem__):
+            chain = chains[ind]
+            common = 0
+            for old, new in zip(previous, chain):
+                if old != new:
+                    break
+                common += 1
+            common = min(common, len(path) - 1)
+            del path[common + 1:]
+            state = path[-1]
+            for symbol in chain[common:]:
+                if state < 0:
+                    break
+                state = self.delta[state].get(symbol, -1)
+                path.append(state)
+            result[ind] = state >= 0 and state in self.accept
+            previous = chain
+        return result
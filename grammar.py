@@ -1,6 +1,7 @@
+import sys
 import typing as tp
-from copy import deepcopy, copy
-from collections import defaultdict
+from copy import deepcopy
+from collections import defaultdict, deque
 
 from graph import Graph
 
@@ -8,6 +9,8 @@ from graph import Graph
 Dictionary that contains rules for given context-free grammar
 Group of rule A -> a1...ak | b1...bl | ... will be represented as a pair:
 A: [[a1, ..., ak], [b1, ..., bl], ...]
+Grammar stores every right part as a tuple.
+delete_vanishings, delete_chain_rules and eliminate_left_recursion don't produce equal rules of one non-terminal.
 """
 Rules = tp.Dict[str, tp.List[tp.Sequence[str]]]
 
@@ -23,98 +26,164 @@ class ContextFreeGrammar:
     start - the start non-terminal symbol of grammar
     rules - rules of context-free grammar
     """
+    __slots__ = ('terminals', 'non_terminals', 'start', 'rules', '_next_candidate', '_vanishings')
+
     def __init__(self,  terminals: tp.Set[str], non_terminals: tp.Set[str], start: str, rules: Rules):
-        self.terminals = terminals
-        self.non_terminals = non_terminals
-        self.start = start
-        self.rules = defaultdict(list, {key: [list(rule) for rule in group] for key, group in rules.items()})
-        self._last_used_symbol = 0
+        # symbols are interned, so that most of comparisons of equal symbols are reduced to pointer comparison
+        self.terminals = {sys.intern(symbol) for symbol in terminals}
+        self.non_terminals = {sys.intern(symbol) for symbol in non_terminals}
+        self.start = sys.intern(start)
+        self.rules = {sys.intern(key): [tuple(sys.intern(symbol) for symbol in rule) for rule in group]
+                      for key, group in rules.items()}
+        self._next_candidate = 0  # numbers below it are never checked again when creating new symbols
+        # vanishing non-terminals, computed on demand and reset by methods changing rules
+        self._vanishings: tp.Optional[tp.FrozenSet[str]] = None
         for non_term in rules:
             assert non_term in non_terminals, "This is not a context-free grammar"
 
+    def copy(self) -> 'ContextFreeGrammar':
+        """
+        Creates a copy of grammar, which can be transformed independently.
+        Symbols and rules are immutable, so only sets and lists containing them are copied.
+        """
+        result = ContextFreeGrammar.__new__(ContextFreeGrammar)
+        result.terminals = set(self.terminals)
+        result.non_terminals = set(self.non_terminals)
+        result.start = self.start
+        result.rules = {non_term: list(group) for non_term, group in self.rules.items()}
+        result._next_candidate = self._next_candidate
+        result._vanishings = self._vanishings
+        return result
+
+    def _reachable(self, rules: Rules, non_terminals: tp.Set[str]) -> tp.Set[str]:
+        """
+        Finds non-terminals from given set that are reachable from start using given rules.
+        """
+        # non-terminals that appear in right parts of rules of every non-terminal
+        produces: tp.Dict[str, tp.Set[str]] = {
+            non_term: {symbol for rule in group for symbol in rule if symbol in non_terminals}
+            for non_term, group in rules.items()
+        }
+        reachable: tp.Set[str] = {self.start} if self.start in non_terminals else set()
+        queue = deque(reachable)
+        while queue:
+            non_term = queue.popleft()
+            for symbol in produces.get(non_term, ()):
+                if symbol not in reachable:
+                    reachable.add(symbol)
+                    queue.append(symbol)
+        return reachable
+
     def delete_unreachable(self) -> None:
         """
         Deletes unreachable non-terminals from grammar.
         """
-        reachable: tp.Set[str] = {self.start} if self.start in self.non_terminals else set()
-        changed: bool = True  # if reachable was updated on last iteration
-        while changed:
-            changed = False
-            for non_term, rules in self.rules.items():
-                if non_term not in reachable:
-                    continue
-                for rule in rules:
-                    for symbol in rule:
-                        if symbol in self.non_terminals and symbol not in reachable:
-                            reachable.add(symbol)
-                            changed = True
+        reachable = self._reachable(self.rules, self.non_terminals)
         # delete not reachable symbols from grammar rules
         for symbol in self.non_terminals:
             if symbol not in reachable:
                 self.rules.pop(symbol, None)
         self.non_terminals = reachable
+        # vanishing of reachable symbol depends only on reachable symbols
+        if self._vanishings is not None:
+            self._vanishings = self._vanishings & reachable
+
+    def _derivable(self, resolved: tp.Set[str]) -> tp.Tuple[tp.Set[str], tp.List[int]]:
+        """
+        Finds non-terminals that have a rule consisting only of symbols from resolved and of found non-terminals.
+        Every rule keeps a counter of its symbols that are not found yet, so each rule is processed once.
+        Returns found non-terminals and final counters of all rules in order of self.rules.
+        """
+        found: tp.Set[str] = set()
+        left_parts: tp.List[str] = []
+        unresolved: tp.List[int] = []  # number of symbols of the rule that are neither resolved nor found yet
+        occurrences: tp.Dict[str, tp.List[int]] = defaultdict(list)  # indices of rules containing the symbol
+        queue: tp.Deque[str] = deque()
+        for non_term, rules in self.rules.items():
+            for rule in rules:
+                ind = len(left_parts)
+                left_parts.append(non_term)
+                count = 0
+                for symbol in rule:
+                    if symbol not in resolved:
+                        occurrences[symbol].append(ind)
+                        count += 1
+                unresolved.append(count)
+                if count == 0 and non_term not in found:
+                    found.add(non_term)
+                    queue.append(non_term)
+        while queue:
+            symbol = queue.popleft()
+            for ind in occurrences.get(symbol, ()):
+                unresolved[ind] -= 1
+                if unresolved[ind] == 0 and left_parts[ind] not in found:
+                    found.add(left_parts[ind])
+                    queue.append(left_parts[ind])
+        return found, unresolved
+
+    def _alive_rules(self) -> tp.Tuple[tp.Set[str], Rules]:
+        """
+        Finds alive non-terminals and their rules that don't contain dead non-terminals.
+        """
+        alive, unresolved = self._derivable(self.terminals)
+        # rule is kept iff all its symbols are resolved, dead non-terminals have no such rules
+        counters = iter(unresolved)
+        alive_rules = {}
+        for symbol, rules in self.rules.items():
+            kept = [rule for rule in rules if not next(counters)]
+            if kept:
+                alive_rules[symbol] = kept
+        return alive, alive_rules
 
     def delete_dead(self) -> None:
         """
         Deletes dead non-terminals from grammar
         """
-        alive: tp.Set[str] = set()
-        changed: bool = True  # if alive was updated on last iteration
-        while changed:
-            changed = False
-            for non_term, rules in self.rules.items():
-                if non_term in alive:
-                    continue
-                for rule in rules:
-                    if all(x in self.terminals or x in alive for x in rule):
-                        alive.add(non_term)
-                        changed = True
-                        break
-        for symbol in self.non_terminals:
-            if symbol not in alive:
-                self.rules.pop(symbol)
-        for symbol, rules in self.rules.items():
-            # delete all rules containing dead non-terminals
-            self.rules[symbol] = [rule for rule in rules if all(x in self.terminals or x in alive for x in rule)]
+        alive, alive_rules = self._alive_rules()
+        self.rules = alive_rules
         self.non_terminals = alive
+        # every vanishing symbol is alive and deleted rules contained dead symbols, so they weren't vanishing
+        if self._vanishings is not None:
+            self._vanishings = self._vanishings & alive
 
     def delete_extra_non_terminals(self) -> None:
         """
         Deletes dead and unreachable non-terminals from grammar.
+        Works as delete_dead followed by delete_unreachable, but rebuilds rules only once.
         """
-        self.delete_dead()
-        self.delete_unreachable()
+        alive, alive_rules = self._alive_rules()
+        # only alive non-terminals are reachable, since dead ones don't appear in alive rules
+        reachable = self._reachable(alive_rules, alive)
+        self.rules = {symbol: alive_rules[symbol] for symbol in reachable}
+        self.non_terminals = reachable
+        if self._vanishings is not None:
+            self._vanishings = self._vanishings & reachable
 
-    def get_vanishings(self) -> tp.List[str]:
+    def get_vanishings(self) -> tp.FrozenSet[str]:
         """
-        Get a list of vanishing terminals
+        Get a set of vanishing non-terminals.
+        Result is cached until rules are changed by one of grammar methods.
         """
-        vanishings: tp.Set[str] = set()
-        changed: bool = True  # if vanishings were updated on last iteration
-        while changed:
-            changed = False
-            for non_term, group in self.rules.items():
-                if non_term in vanishings:
-                    continue
-                for rule in group:
-                    if all(x in vanishings for x in rule):
-                        vanishings.add(non_term)
-                        changed = True
-                        break
-        return vanishings
+        if self._vanishings is None:
+            self._vanishings = frozenset(self._derivable(set())[0])
+        return self._vanishings
 
     def has_left_recursion(self) -> bool:
         """
         Checks whether grammar has left_recursion
         """
         vanishings = self.get_vanishings()
-        graph: tp.Dict[str, tp.Set[str]] = {v: set() for v in self.non_terminals}
+        # only non-terminals which have successors are stored
+        graph: tp.Dict[str, tp.Set[str]] = {}
         for symbol, group in self.rules.items():
             for rule in group:
                 for sec_symbol in rule:
                     if sec_symbol not in self.non_terminals:
                         break
-                    graph[symbol].add(sec_symbol)
+                    if sec_symbol == symbol:
+                        # direct left recursion, there is no need to build the rest of graph
+                        return True
+                    graph.setdefault(symbol, set()).add(sec_symbol)
                     if sec_symbol not in vanishings:
                         break
         # grammar has left recursion iff graph has cycle
@@ -128,48 +197,60 @@ class ContextFreeGrammar:
         vanishings = self.get_vanishings()
         for symb, group in self.rules.items():
             new_rules = []
+            seen: tp.Set[tp.Tuple[str, ...]] = set()  # to skip equal rules
             for rule in group:
-                vanishing_ind = []
-                for i, ch in enumerate(rule):
-                    if ch in vanishings:
-                        vanishing_ind.append(i)
-                combinations = 1 << len(vanishing_ind)
-                vanishing_ind.append(len(rule))
-                for mask in range(combinations):
-                    beg = 0
-                    new_rule = []
-                    for i, ind in enumerate(vanishing_ind):
-                        new_rule.extend(rule[beg:ind + (1 if (1 << i) & mask else 0)])
-                        beg = ind + 1
-                    if new_rule:
+                vanishing_ind = [i for i, ch in enumerate(rule) if ch in vanishings]
+                removed = [False] * len(vanishing_ind)
+                cur = list(rule)
+                # go through subsets of vanishing symbols in Gray code order,
+                # so that every next rule differs from the previous one by one symbol
+                for step in range(1 << len(vanishing_ind)):
+                    if step:
+                        i = (step & -step).bit_length() - 1
+                        offset = vanishing_ind[i] - sum(removed[:i])
+                        if removed[i]:
+                            cur.insert(offset, rule[vanishing_ind[i]])
+                        else:
+                            cur.pop(offset)
+                        removed[i] = not removed[i]
+                    new_rule = tuple(cur)
+                    if new_rule and new_rule not in seen:
+                        seen.add(new_rule)
                         new_rules.append(new_rule)
             self.rules[symb] = new_rules
+        # now only rule with empty right part is the rule of new start
+        self._vanishings = frozenset()
         # if there is an empty word in language we should add it
         if self.start in vanishings:
             new_start = self._get_next_unused()
             self.non_terminals.add(new_start)
-            self.rules[new_start] = [[self.start], []]
+            self.rules[new_start] = [(self.start,), ()]
             self.start = new_start
+            self._vanishings = frozenset({new_start})
 
     def delete_chain_rules(self) -> None:
         """
         Deletes rules of type A->B
         """
         graph = {v: [] for v in self.non_terminals}
+        non_chain_rules = {v: [] for v in self.non_terminals}
         for v in graph:
-            for rule in self.rules[v]:
+            for rule in self.rules.get(v, ()):
                 if len(rule) == 1 and rule[0] in self.non_terminals:
                     graph[v].append(rule[0])
-        reachable = Graph(graph).find_reachables()
-        # delete chain rules
-        for symb, rules in self.rules.items():
-            self.rules[symb] = [rule for rule in rules if len(rule) != 1 or rule[0] not in self.non_terminals]
-        new_rules = deepcopy(self.rules)
-        for a, reachables in reachable.items():
-            for b in reachables:
-                if a != b:
-                    new_rules[a].extend(self.rules[b])
-        self.rules = new_rules
+                else:
+                    non_chain_rules[v].append(rule)
+        # all non-terminals of one strongly connected component of chain graph get the same rules
+        comp_id, dag = Graph(graph).scc()
+        comp_rules: tp.Dict[int, tp.Dict[tp.Tuple[str, ...], None]] = {component: {} for component in dag}
+        for v, rules in non_chain_rules.items():
+            comp_rules[comp_id[v]].update(dict.fromkeys(rules))
+        # chain rules lead to components with smaller numbers, so their rules are already complete
+        for component in range(len(dag)):
+            for next_component in dag[component]:
+                comp_rules[component].update(comp_rules[next_component])
+        self.rules = {v: list(comp_rules[comp_id[v]]) for v in graph}
+        self._vanishings = None
 
     def eliminate_left_recursion(self) -> None:
         """
@@ -187,10 +268,19 @@ class ContextFreeGrammar:
         if self.start in nonterminals:
             ind = nonterminals.index(self.start)
             nonterminals[ind], nonterminals[-1] = nonterminals[-1], nonterminals[ind]
+        remaining = set(nonterminals)
+        # for every symbol: non-terminals that have a rule beginning with it
+        by_first: tp.Dict[str, tp.Set[str]] = defaultdict(set)
+        for symb, rules in self.rules.items():
+            for rule in rules:
+                if rule:
+                    by_first[rule[0]].add(symb)
         while nonterminals:
             non_term = nonterminals.pop()
+            remaining.discard(non_term)
+            beginning_with = by_first.pop(non_term, set())
             # if doesn't have recursion
-            if not any(rule and rule[0] == non_term for rule in self.rules[non_term]):
+            if non_term not in beginning_with:
                 continue
             non_term_rules, other_rules = [], []
             for rule in self.rules[non_term]:
@@ -200,53 +290,60 @@ class ContextFreeGrammar:
                     other_rules.append(rule)
             new_symb = self._get_next_unused()
             self.non_terminals.add(new_symb)
-            self.rules[non_term] = [rule + [new_symb] for rule in other_rules]
-            self.rules[new_symb] = [rule + [new_symb] for rule in non_term_rules] + [[]]
+            self.rules[non_term] = [rule + (new_symb,) for rule in other_rules]
+            self.rules[new_symb] = [rule + (new_symb,) for rule in non_term_rules] + [()]
             # replace it in every right part beginning of bigger non-terminals rules
-            for bigger_symb in nonterminals:
-                if any(rule and rule[0] == non_term for rule in self.rules[bigger_symb]):
-                    new_rules = []
-                    for rule in self.rules[bigger_symb]:
-                        if rule and rule[0] == non_term:
-                            for non_term_left in self.rules[non_term]:
-                                new_rules.append(non_term_left + rule[1:])
-                        else:
-                            new_rules.append(rule)
-                    self.rules[bigger_symb] = new_rules
+            for bigger_symb in beginning_with & remaining:
+                new_rules = []
+                for rule in self.rules[bigger_symb]:
+                    if rule and rule[0] == non_term:
+                        for non_term_left in self.rules[non_term]:
+                            new_rules.append(non_term_left + rule[1:])
+                            by_first[non_term_left[0]].add(bigger_symb)
+                    else:
+                        new_rules.append(rule)
+                self.rules[bigger_symb] = list(dict.fromkeys(new_rules))
+        self._vanishings = None
 
     def _left_factorize_group(self, non_term: str) -> None:
-        rules_by_first = defaultdict(list)
-        for rule in self.rules[non_term]:
-            rules_by_first[rule[0] if rule else ''].append(rule)
-        new_rules = []
-        new_symbols = []
-        for symbol, sym_rules in rules_by_first.items():
-            if not symbol or symbol in self.terminals or len(sym_rules) < 2:
-                new_rules.extend(sym_rules)
-            else:
-                new_beg = self._get_next_unused()
-                self.non_terminals.add(new_beg)
-                new_symbols.append(new_beg)
-                new_rules.append([symbol, new_beg])
-                self.rules[new_beg] = [rule[1:] for rule in sym_rules]
-        self.rules[non_term] = new_rules
-        for new_sym in new_symbols:
-            self._left_factorize_group(new_sym)
+        # stack of non-terminals to factorize with their rules, new symbols are processed in depth-first order
+        stack = [(non_term, self.rules[non_term])]
+        while stack:
+            symb, rules = stack.pop()
+            rules_by_first = defaultdict(list)
+            for rule in rules:
+                rules_by_first[rule[0] if rule else ''].append(rule)
+            new_rules = []
+            new_groups = []
+            for symbol, sym_rules in rules_by_first.items():
+                if not symbol or symbol in self.terminals or len(sym_rules) < 2:
+                    new_rules.extend(sym_rules)
+                else:
+                    new_beg = self._get_next_unused()
+                    self.non_terminals.add(new_beg)
+                    new_rules.append((symbol, new_beg))
+                    self.rules[new_beg] = [rule[1:] for rule in sym_rules]
+                    new_groups.append((new_beg, self.rules[new_beg]))
+            self.rules[symb] = new_rules
+            stack.extend(reversed(new_groups))
 
     def left_factorize(self) -> None:
         """
         Performs left factorization of rules
         """
-        for non_term in copy(self.non_terminals):
+        for non_term in list(self.rules):
             self._left_factorize_group(non_term)
+        self._vanishings = None
 
     def _get_next_unused(self) -> str:
         """
         Helper function to create new unused symbol
         """
-        while str(self._last_used_symbol) in self.non_terminals or str(self._last_used_symbol) in self.terminals:
-            self._last_used_symbol += 1
-        return str(self._last_used_symbol)
+        while True:
+            symbol = sys.intern(str(self._next_candidate))
+            self._next_candidate += 1
+            if symbol not in self.non_terminals and symbol not in self.terminals:
+                return symbol
 
 
 def test_delete_extra():
@@ -265,6 +362,9 @@ def test_delete_extra():
     new_grammar.delete_extra_non_terminals()
     assert new_grammar.non_terminals == set()
     assert new_grammar.rules == dict()
+    new_grammar = grammar.copy()
+    new_grammar.delete_dead()
+    assert new_grammar.non_terminals == {'B'} and grammar.non_terminals == {'A', 'B'}
     new_grammar = deepcopy(grammar)
     new_grammar.delete_unreachable()
     new_grammar.delete_dead()
@@ -300,7 +400,10 @@ def test_has_recursion():
 def test_delete_vanishings():
     grammar = ContextFreeGrammar({'a', 'b'}, {'A', 'B', 'C'}, 'A', {'A': ['BC'], 'B': ['C'], 'C': ['']})
     grammar.delete_vanishings()
-    assert [] in grammar.rules[grammar.start]
+    assert () in grammar.rules[grammar.start]
+    grammar = ContextFreeGrammar({'a'}, {'A', 'B'}, 'A', {'A': ['BaBB'], 'B': ['', 'a']})
+    grammar.delete_vanishings()
+    assert sorted("".join(rule) for rule in grammar.rules['A']) == ['Ba', 'BaB', 'BaBB', 'a', 'aB', 'aBB']
 
 
 def test_left_factorize():
@@ -316,7 +419,7 @@ def check_eliminate_recursion():
                                                                             'exp': [['exp', '+', 'exp'], ['term']]})
     grammar.eliminate_left_recursion()
     print(grammar.rules, grammar.start)
-    # {'term': [['c'], ['c', '*', 'term']], 'exp': [['term', '0']], '0': [['+', 'exp', '0'], []]} exp
+    # {'term': [('c',), ('c', '*', 'term')], 'exp': [('c', '0'), ('c', '*', 'term', '0')], '0': [('+', 'exp', '0'), ()]} exp
 
 
 if __name__ == "__main__":
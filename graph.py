@@ -10,46 +10,98 @@ class Color(Enum):
     VISITED = 2
 
 
-class CycleFound(Exception):
-    pass
-
-
 class Graph:
     def __init__(self, graph: tp.Dict[T, tp.Iterable[T]]):
         self.graph = graph
         self.state = {}
 
     def has_cycle(self) -> bool:
+        """
+        Checks whether graph has a cycle. Vertices that aren't keys of graph are considered to have no successors.
+        """
         self.state = {v: Color.NOT_VISITED for v in self.graph}
-        for v in self.graph:
-            try:
-                self._dfs(v)
-            except CycleFound:
-                return True
+        for root in self.graph:
+            if self.state[root] != Color.NOT_VISITED:
+                continue
+            self.state[root] = Color.VISITING
+            # every frame contains vertex and iterator over its successors that are not processed yet
+            stack = [(root, iter(self.graph[root]))]
+            while stack:
+                v, successors = stack[-1]
+                for u in successors:
+                    state = self.state.get(u, Color.NOT_VISITED)
+                    if state == Color.VISITING:
+                        return True
+                    if state == Color.NOT_VISITED:
+                        self.state[u] = Color.VISITING
+                        stack.append((u, iter(self.graph.get(u, ()))))
+                        break
+                else:
+                    self.state[v] = Color.VISITED
+                    stack.pop()
         return False
 
-    def find_reachables(self) -> tp.Dict[T, tp.Set[T]]:
-        def dfs(v: T) -> None:
-            visited.add(v)
-            for u in self.graph[v]:
-                if u not in visited:
-                    dfs(u)
-        result = {}
-        for v in self.graph:
-            visited = set()
-            dfs(v)
-            result[v] = visited
-        return result
+    def scc(self) -> tp.Tuple[tp.Dict[T, int], tp.Dict[int, tp.Set[int]]]:
+        """
+        Finds strongly connected components with Tarjan's algorithm.
+        Returns component of every vertex and graph of edges between components.
+        Components are numbered in reverse topological order: every edge goes to a component with smaller number.
+        Vertices that aren't keys of graph are considered to have no successors.
+        """
+        index: tp.Dict[T, int] = {}  # order in which vertices were visited
+        low: tp.Dict[T, int] = {}  # the smallest index reachable from subtree of vertex via single back edge
+        comp_id: tp.Dict[T, int] = {}
+        dag: tp.Dict[int, tp.Set[int]] = {}
+        # visited vertices without component yet
+        visited_stack = []
+        for root in self.graph:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            visited_stack.append(root)
+            stack = [(root, iter(self.graph[root]))]
+            while stack:
+                v, successors = stack[-1]
+                for u in successors:
+                    if u not in index:
+                        index[u] = low[u] = len(index)
+                        visited_stack.append(u)
+                        stack.append((u, iter(self.graph.get(u, ()))))
+                        break
+                    if u not in comp_id:
+                        low[v] = min(low[v], index[u])
+                else:
+                    stack.pop()
+                    if stack:
+                        parent = stack[-1][0]
+                        low[parent] = min(low[parent], low[v])
+                    if low[v] == index[v]:
+                        component = len(dag)
+                        dag[component] = set()
+                        u = None
+                        while u != v:
+                            u = visited_stack.pop()
+                            comp_id[u] = component
+        for v, successors in self.graph.items():
+            for u in successors:
+                if comp_id[u] != comp_id[v]:
+                    dag[comp_id[v]].add(comp_id[u])
+        return comp_id, dag
 
-    def _dfs(self, v):
-        if self.state[v] == Color.VISITED:
-            return
-        if self.state[v] == Color.VISITING:
-            raise CycleFound()
-        self.state[v] = Color.VISITING
-        for next_v in self.graph[v]:
-            self._dfs(next_v)
-        self.state[v] = Color.VISITED
+    def find_reachables(self) -> tp.Dict[T, tp.Set[T]]:
+        comp_id, dag = self.scc()
+        members: tp.Dict[int, tp.Set[T]] = {component: set() for component in dag}
+        for v, component in comp_id.items():
+            members[component].add(v)
+        # all vertices of component have the same reachables,
+        # and components which are reachable from it have smaller numbers, so they are already processed
+        comp_reachables: tp.List[tp.Set[T]] = []
+        for component in range(len(dag)):
+            reachables = set(members[component])
+            for next_component in dag[component]:
+                reachables |= comp_reachables[next_component]
+            comp_reachables.append(reachables)
+        return {v: set(comp_reachables[comp_id[v]]) for v in self.graph}
 
 
 def test_has_cycle():
@@ -58,7 +110,22 @@ def test_has_cycle():
     assert not  graph.has_cycle()
     graph = Graph({2: [3, 4], 1: [3], 3: [4], 4: [1]})
     assert graph.has_cycle()
+    assert not Graph({1: [2, 3], 3: [2]}).has_cycle()
+    # long path shouldn't exceed recursion limit
+    path = Graph({i: [i + 1] for i in range(10000)} | {10000: []})
+    assert not path.has_cycle()
+    assert len(path.scc()[1]) == 10001
+
+
+def test_find_reachables():
+    graph = Graph({1: [2], 2: [3, 1], 3: [4], 4: [3], 5: [5, 1]})
+    comp_id, dag = graph.scc()
+    assert comp_id[1] == comp_id[2] and comp_id[3] == comp_id[4] and len(dag) == 3
+    assert dag[comp_id[1]] == {comp_id[3]} and dag[comp_id[5]] == {comp_id[1]}
+    assert graph.find_reachables() == {1: {1, 2, 3, 4}, 2: {1, 2, 3, 4}, 3: {3, 4}, 4: {3, 4}, 5: {1, 2, 3, 4, 5}}
+    assert Graph({1: [2], 2: [3]}).find_reachables() == {1: {1, 2, 3}, 2: {2, 3}}
 
 
 if __name__ == "__main__":
-    test_has_cycle()
\ No newline at end of file
+    test_has_cycle()
+    test_find_reachables()
\ No newline at end of file
@@ -1,9 +1,12 @@
+import sys
 import typing as tp
 from collections import defaultdict
 from dataclasses import dataclass
 
+from graph import Graph
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class Transition:
     """
     Transition represents the transition in LTS
@@ -14,24 +17,45 @@ class Transition:
     to: int
 
 
+_NO_TRANSITIONS: tp.Dict[str, tp.Tuple[int, ...]] = {}
+
+
 class LTS:
     """
     LTS represents the labelled transition system.
     Constructor parameters are starting state, ending state, set of states, tokens and transitions.
+    Instead of transitions, their targets grouped by source state and label can be given as delta.
     """
 
-    def __init__(self, start: int, end: int, states: tp.Set[int], tokens: tp.Set[str], transitions: tp.Set[Transition]):
+    def __init__(self, start: int, end: int, states: tp.Set[int], tokens: tp.Set[str],
+                 transitions: tp.Optional[tp.Set[Transition]] = None,
+                 delta: tp.Optional[tp.Dict[tp.Tuple[int, str], tp.Sequence[int]]] = None):
         self.start = start
         self.end = end
         self.tokens = tokens
         self.states = states
-        self.transitions = transitions
-        # we store transitions in dict with keys (from, lbl) to get faster access to transitions
-        # given state, from which transitions are needed, and label
-        trans_from_with_label: tp.Dict[tp.Tuple[int, str], tp.List[Transition]] = defaultdict(list)
-        for tr in transitions:
-            trans_from_with_label[(tr.from_, tr.lbl)].append(tr)
-        self.trans_from_lbl = dict(trans_from_with_label)
+        self._transitions = transitions
+        if transitions is None and delta is None:
+            raise ValueError("Either transitions or delta of LTS should be given")
+        if delta is None:
+            delta = defaultdict(list)
+            for tr in transitions:
+                delta[(tr.from_, tr.lbl)].append(tr.to)
+        # we store targets of transitions in dict from state to dict from label to targets,
+        # so that finding states reachable from given state by given label doesn't need to build key tuple
+        self.delta: tp.Dict[int, tp.Dict[str, tp.Tuple[int, ...]]] = {}
+        for (from_, lbl), to in delta.items():
+            self.delta.setdefault(from_, {})[sys.intern(lbl)] = tuple(to)
+        # epsilon-closures of single states don't change, so they are found once for all states
+        epsilon_graph = {state: self.delta.get(state, _NO_TRANSITIONS).get("", ()) for state in states}
+        self._closures = Graph(epsilon_graph).find_reachables()
+
+    @property
+    def transitions(self) -> tp.Set[Transition]:
+        if self._transitions is None:
+            self._transitions = {Transition(from_, lbl, to) for from_, by_label in self.delta.items()
+                                 for lbl, targets in by_label.items() for to in targets}
+        return self._transitions
 
     def __repr__(self) -> str:
         return f"start: {self.start}, end: {self.end}, transitions: {sorted(self.transitions, key=lambda x: x.from_)}"
@@ -40,32 +64,14 @@ class LTS:
         """
         returns the closure of given states, e.g. all states reachable via epsilon-transitions
         """
-        set_ = set(states)
-        added = list(set_)
-        while added:
-            cur = added.pop()
-            # if no epsilon transitions
-            if self.trans_from_lbl.get((cur, "")) is None:
-                continue
-            for tr in self.trans_from_lbl[(cur, "")]:
-                if tr.to not in set_:
-                    set_.add(tr.to)
-                    added.append(tr.to)
-        return set_
+        return set().union(*(self._closures[state] for state in states))
 
     def accepts(self, chain: tp.Sequence[str]) -> bool:
-        reached = {(x, 0) for x in self.closure([self.start])}
-        while reached:
-            state, length = reached.pop()
-            # if we found good path
-            if length == len(chain) and state == self.end:
-                return True
-            # if path is longer than chain
-            if length >= len(chain):
-                continue
-            if self.trans_from_lbl.get((state, chain[length])):
-                new_states = []
-                for tr in self.trans_from_lbl[(state, chain[length])]:
-                    new_states.append(tr.to)
-                reached.update([(x, length + 1) for x in self.closure(new_states)])
-        return False
+        # states reachable by prefix of chain that is already read
+        frontier = self.closure([self.start])
+        for symbol in chain:
+            frontier = self.closure([to for state in frontier
+                                     for to in self.delta.get(state, _NO_TRANSITIONS).get(symbol, ())])
+            if not frontier:
+                return False
+        return self.end in frontier
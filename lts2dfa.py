@@ -0,0 +1,54 @@
+from collections import defaultdict
+from dfa import DFA
+from lts import LTS
+import typing as tp
+
+
+def lts2dfa(lts: LTS) -> DFA:
+    """
+    Builds DFA from given LTS using subset construction.
+    Every state of DFA corresponds to closed set of LTS states, the state of closure of LTS start is starting.
+    """
+    start = frozenset(lts.closure([lts.start]))
+    ids: tp.Dict[tp.FrozenSet[int], int] = {start: 0}
+    delta: tp.List[tp.Dict[str, int]] = [{}]
+    accept: tp.Set[int] = set()
+    queue = [start]
+    while queue:
+        states = queue.pop()
+        state_id = ids[states]
+        if lts.end in states:
+            accept.add(state_id)
+        # only labels of transitions leaving the states are checked
+        targets: tp.Dict[str, tp.List[int]] = defaultdict(list)
+        for state in states:
+            for label, to in lts.delta.get(state, {}).items():
+                if label:  # empty label is used for epsilon-transitions
+                    targets[label].extend(to)
+        for label, to in targets.items():
+            next_states = frozenset(lts.closure(to))
+            if next_states not in ids:
+                ids[next_states] = len(delta)
+                delta.append({})
+                queue.append(next_states)
+            delta[state_id][label] = ids[next_states]
+    return DFA(0, accept, delta)
+
+
+def main():
+    """
+    examples and some checks for correct work
+    """
+    # LTS for ((a|b)*,c) with epsilon-transition from start
+    lts = LTS(0, 2, {0, 1, 2}, {"", "a", "b", "c"},
+              delta={(0, ""): [1], (1, "a"): [1], (1, "b"): [1], (1, "c"): [2]})
+    dfa = lts2dfa(lts)
+    print(dfa)  # DFA(start=0, accept={2}, delta=[{'a': 1, 'b': 1, 'c': 2}, {'a': 1, 'b': 1, 'c': 2}, {}])
+    assert dfa.accepts("abac")
+    assert dfa.accepts("c")
+    assert not dfa.accepts("abca")
+    assert not dfa.accepts("")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,65 @@
 from grammar import ContextFreeGrammar
-from copy import deepcopy
+from collections import defaultdict
 import typing as tp
 
 
+"""
+Earley item: left part of rule, right part of rule, position of dot in right part and position in word,
+from which recognition of rule started
+"""
+Item = tp.Tuple[str, tp.Tuple[str, ...], int, int]
+
+
 class Parser:
     """
-    Normalizes grammar so that is doesn't have left recursion and is left factorized.
-    Performs left recursive parsing to check whether some word is in the given grammar.
+    Checks whether some word is in the given grammar with Earley algorithm.
+    Earley algorithm works with any context-free grammar, so grammar isn't normalized.
     """
     def __init__(self, grammar: ContextFreeGrammar) -> None:
-        self._grammar = deepcopy(grammar)
-        self._grammar.eliminate_left_recursion()
-        self._grammar.left_factorize()
-
-    def is_in_language(self, word: tp.Sequence[str], cur=None) -> bool:
-        if cur is None:
-            cur = [self._grammar.start]
-        if not word:
-            vanishings = self._grammar.get_vanishings()
-            return all(x in vanishings for x in cur)
-        if not cur:
-            return False
-        if cur and cur[0] in self._grammar.terminals:
-            if word[0] == cur[0]:
-                return self.is_in_language(word[1:], cur[1:])
-            return False
-        for rule in self._grammar.rules[cur[0]]:
-            if self.is_in_language(word, rule + cur[1:]):
-                return True
-        return False
+        # grammar is copied, so that later changes of given grammar don't affect parser,
+        # and everything needed for recognition is found once
+        self._grammar = grammar.copy()
+        self._vanishings = self._grammar.get_vanishings()
+        self._terminals = frozenset(self._grammar.terminals)
+        self._rules = self._grammar.rules
+
+    def is_in_language(self, word: tp.Sequence[str]) -> bool:
+        terminals = self._terminals
+        rules = self._rules
+        vanishings = self._vanishings
+        chart: tp.List[tp.Set[Item]] = [set() for _ in range(len(word) + 1)]
+        # items of every chart position grouped by the symbol after dot
+        waiting: tp.List[tp.Dict[str, tp.List[Item]]] = [defaultdict(list) for _ in range(len(word) + 1)]
+        start = self._grammar.start
+        chart[0] = {(start, rule, 0, 0) for rule in rules.get(start, ())}
+        for pos in range(len(word) + 1):
+            if not chart[pos]:
+                return False
+            agenda = list(chart[pos])
+            while agenda:
+                item = agenda.pop()
+                left, rule, dot, origin = item
+                if dot == len(rule):
+                    # completion: rule is recognized, so move dot in rules waiting for its left part
+                    new_items = [(lft, rl, dt + 1, orig) for lft, rl, dt, orig in waiting[origin].get(left, ())]
+                elif rule[dot] in terminals:
+                    # scanning
+                    if pos < len(word) and word[pos] == rule[dot]:
+                        chart[pos + 1].add((left, rule, dot + 1, origin))
+                    continue
+                else:
+                    # prediction, vanishing symbol can be skipped right away,
+                    # since its completion at this position may have been processed already
+                    symbol = rule[dot]
+                    waiting[pos][symbol].append(item)
+                    new_items = [(symbol, rl, 0, pos) for rl in rules.get(symbol, ())]
+                    if symbol in vanishings:
+                        new_items.append((left, rule, dot + 1, origin))
+                for new_item in new_items:
+                    if new_item not in chart[pos]:
+                        chart[pos].add(new_item)
+                        agenda.append(new_item)
+        return any(left == start and dot == len(rule) and origin == 0 for left, rule, dot, origin in chart[-1])
 
 
 def test_parser_brackets() -> None:
@@ -39,6 +70,7 @@ def test_parser_brackets() -> None:
     assert parser.is_in_language('()')
     assert parser.is_in_language("()()(())")
     assert not parser.is_in_language("())((())")
+    assert parser.is_in_language("()" * 20 + "(" * 20 + ")" * 20)
 
 
 def test_parser_arithmetic() -> None:
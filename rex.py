@@ -1,16 +1,81 @@
 import typing as tp
+from functools import cached_property, lru_cache
+
+from dfa import DFA
+from lts import LTS
+from lts2dfa import lts2dfa
+
+
+"""
+Targets of LTS transitions grouped by source state and label
+"""
+Delta = tp.Dict[tp.Tuple[int, str], tp.List[int]]
+
+"""
+Part of LTS built for regular expression: starting state, ending state and transitions
+"""
+Fragment = tp.Tuple[int, int, Delta]
+
+
+def _add_epsilon(delta: Delta, from_: int, to: int) -> None:
+    targets = delta.setdefault((from_, ""), [])
+    if to not in targets:
+        targets.append(to)
 
 
 class ReX:
     """
     Abstract class that contains regular expression.
+    Checks strings with DFA, which is built on first call of accepts.
     """
     def __str__(self) -> str:
         pass
 
-    def accepts(self, string: str) -> bool:
+    def fragment(self, first_state: int, split_symbols: bool = False) -> Fragment:
+        """
+        Builds transitions of LTS for regular expression, which uses states first_state, ..., end.
+        Returns starting state, ending state and transitions.
+        If split_symbols is set, symbol of several characters is matched by chain of transitions by single characters.
+        """
         pass
 
+    def compile(self) -> DFA:
+        """
+        Builds DFA accepting the same strings as regular expression, symbols are matched character by character.
+        """
+        start, end, delta = self.fragment(0, split_symbols=True)
+        return lts2dfa(LTS(start, end, range(start, end + 1), {label for _, label in delta}, delta=delta))
+
+    @cached_property
+    def _dfa(self) -> DFA:
+        return self.compile()
+
+    def accepts(self, string: tp.Sequence[str]) -> bool:
+        return self._dfa.accepts(string)
+
+    def accepts_all(self, strings: tp.Sequence[tp.Sequence[str]]) -> tp.List[bool]:
+        return self._dfa.accepts_all(strings)
+
+    def compile_to_source(self, name: str) -> str:
+        """
+        Generates source of Python function with given name, that checks strings with DFA of regular expression.
+        Transitions of DFA are written as if/elif statements, so the function doesn't use any tables.
+        """
+        dfa = self._dfa
+        lines = [f"def {name}(string):", f"    state = {dfa.start}", "    for symbol in string:"]
+        for state, transitions in enumerate(dfa.delta):
+            lines.append(f"        {'elif' if state else 'if'} state == {state}:")
+            for ind, (label, to) in enumerate(transitions.items()):
+                lines.append(f"            {'elif' if ind else 'if'} symbol == {label!r}:")
+                lines.append(f"                state = {to}")
+            if transitions:
+                lines.append("            else:")
+                lines.append("                return False")
+            else:
+                lines.append("            return False")
+        lines.append(f"    return state in {tuple(sorted(dfa.accept))!r}")
+        return "\n".join(lines) + "\n"
+
 
 class Epsilon(ReX):
     """
@@ -19,8 +84,8 @@ class Epsilon(ReX):
     def __str__(self) -> str:
         return ""
 
-    def accepts(self, string: str) -> bool:
-        return not string
+    def fragment(self, first_state: int, split_symbols: bool = False) -> Fragment:
+        return first_state, first_state + 1, {(first_state, ""): [first_state + 1]}
 
 
 class Symbol(ReX):
@@ -33,8 +98,10 @@ class Symbol(ReX):
     def __str__(self) -> str:
         return self.value
 
-    def accepts(self, string: str) -> bool:
-        return self.value == string
+    def fragment(self, first_state: int, split_symbols: bool = False) -> Fragment:
+        labels = self.value if split_symbols and self.value else [self.value]
+        delta = {(first_state + ind, label): [first_state + ind + 1] for ind, label in enumerate(labels)}
+        return first_state, first_state + len(labels), delta
 
 
 class Concatenation(ReX):
@@ -48,12 +115,13 @@ class Concatenation(ReX):
     def __str__(self) -> str:
         return f"({self.first},{self.second})"
 
-    def accepts(self, string: str) -> bool:
-        for left_size in range(len(string) + 1):
-            lhs, rhs = string[:left_size], string[left_size:]
-            if self.first.accepts(lhs) and self.second.accepts(rhs):
-                return True
-        return False
+    def fragment(self, first_state: int, split_symbols: bool = False) -> Fragment:
+        fir_start, fir_end, delta = self.first.fragment(first_state, split_symbols)
+        # states of first part are used
+        sec_start, sec_end, sec_delta = self.second.fragment(fir_end + 1, split_symbols)
+        delta.update(sec_delta)
+        _add_epsilon(delta, fir_end, sec_start)
+        return fir_start, sec_end, delta
 
 
 class Union(ReX):
@@ -68,8 +136,17 @@ class Union(ReX):
     def __str__(self) -> str:
         return f"({self.first}|{self.second})"
 
-    def accepts(self, string: str) -> bool:
-        return self.first.accepts(string) or self.second.accepts(string)
+    def fragment(self, first_state: int, split_symbols: bool = False) -> Fragment:
+        fir_start, fir_end, delta = self.first.fragment(first_state + 1, split_symbols)  # first state is for start
+        # states of first part are used
+        sec_start, sec_end, sec_delta = self.second.fragment(fir_end + 1, split_symbols)
+        start, end = first_state, sec_end + 1
+        delta.update(sec_delta)  # parts have different states, so their keys don't intersect
+        _add_epsilon(delta, start, fir_start)
+        _add_epsilon(delta, start, sec_start)
+        _add_epsilon(delta, fir_end, end)
+        _add_epsilon(delta, sec_end, end)
+        return start, end, delta
 
 
 class KleeneStar(ReX):
@@ -83,26 +160,23 @@ class KleeneStar(ReX):
     def __str__(self) -> str:
         return str(self.inner) + "*"
 
-    def accepts(self, string: str) -> bool:
-        if not string:
-            return True
-
-        for left_size in range(1, len(string) + 1):
-            lhs, rhs = string[:left_size], string[left_size:]
-            if self.inner.accepts(lhs) and self.accepts(rhs):
-                return True
-
-        return False
+    def fragment(self, first_state: int, split_symbols: bool = False) -> Fragment:
+        # we reserve first state for start
+        inner_start, inner_end, delta = self.inner.fragment(first_state + 1, split_symbols)
+        start, end = first_state, inner_end + 1
+        # start is entered only from outside and after every repetition of inner part, so it can be left to end
+        _add_epsilon(delta, start, inner_start)
+        _add_epsilon(delta, inner_end, start)
+        _add_epsilon(delta, start, end)
+        return start, end, delta
 
 
 class RexIterator:
     def __init__(self, expression: str):
-        self.expression = expression
+        # whitespaces don't matter, so they are removed once instead of being skipped after every token
+        self.expression = "".join(expression.split())
         self.cursor = 0
 
-        while self.token().isspace():
-            self.cursor += 1
-
     def is_end(self) -> bool:
         return self.cursor >= len(self.expression)
 
@@ -111,8 +185,6 @@ class RexIterator:
 
     def advance(self):
         self.cursor += 1
-        while self.cursor < len(self.expression) and self.token().isspace():
-            self.cursor += 1
 
     def __next__(self) -> ReX:
         if self.is_end():
@@ -181,6 +253,17 @@ def parse(expression: str) -> ReX:
     return rex
 
 
+@lru_cache(maxsize=None)
+def compile_matcher(expression: str) -> tp.Callable[[str], bool]:
+    """
+    Parses expression and builds function checking whether string is accepted by it from generated source.
+    Functions are cached, so the same expression is compiled only once.
+    """
+    namespace: tp.Dict[str, tp.Any] = {}
+    exec(parse(expression).compile_to_source("matcher"), namespace)
+    return namespace["matcher"]
+
+
 ############
 # EXAMPLES #
 ############
@@ -201,6 +284,22 @@ def single_example():
     assert not rex.accepts("bacbac")
     assert not rex.accepts("aa")
 
+    # nested stars are matched in linear time
+    assert not parse("(a*,a*)*").accepts("a" * 30 + "b")
+
+    matcher = compile_matcher("(a,(b|c))*")
+    assert matcher is compile_matcher("(a,(b|c))*")
+    assert matcher("acab")
+    assert not matcher("bacbac")
+
+    # symbols of several characters are matched by characters
+    assert Symbol("cat").accepts("cat")
+    assert Concatenation(Symbol("ab"), Symbol("c")).accepts("abc")
+    assert not KleeneStar(Symbol("ab")).accepts("aba")
+
+    strings = ["", "a", "ab", "aba", "abab", "abac", "acab", "b", "ac"]
+    assert rex.accepts_all(strings) == [rex.accepts(string) for string in strings]
+
 
 def some_examples(sequence_string: str, strings: tp.List[str]):
     """
@@ -211,9 +310,9 @@ def some_examples(sequence_string: str, strings: tp.List[str]):
     :arg strings: strings to check
     """
     for expression in RexSequence(sequence_string):
-        for string in strings:
+        for string, accepted in zip(strings, expression.accepts_all(strings)):
             print(expression,
-                  "accepts" if expression.accepts(string) else "not accepts",
+                  "accepts" if accepted else "not accepts",
                   string)
 
 
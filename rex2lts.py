@@ -1,59 +1,95 @@
-from lts import LTS, Transition
-from rex import ReX, Epsilon, Symbol, KleeneStar, Union, Concatenation
+from collections import defaultdict
+from graph import Graph
+from lts import LTS
+from rex import ReX, Delta, Symbol, KleeneStar, Union, Concatenation
 import typing as tp
 
 
-def rex2lts(rexp: ReX, first_state=0) -> LTS:
+def _remove_epsilon(start: int, end: int, delta: Delta) -> tp.Tuple[int, int, Delta, tp.Set[str]]:
+    """
+    Removes epsilon-transitions from LTS built by ReX.fragment and drops states unreachable from start.
+    Transition by label from the closure of state becomes transition from the state itself,
+    and if target's closure contains end, transition to end is added too, since end has no outgoing transitions.
+    Targets, closures of which have no transitions by labels, are replaced by end completely.
+    Only epsilon-transition from start to end is kept, if LTS accepts empty chain.
+    States are renumbered so that start is the first one and end is the last one.
+    Labels of transitions are collected on the way and returned as tokens of LTS.
+    """
+    closures = Graph({state: delta.get((state, ""), ()) for state in range(start, end + 1)}).find_reachables()
+    labelled: tp.Dict[int, tp.List[tp.Tuple[str, tp.List[int]]]] = defaultdict(list)
+    tokens = set()  # every labelled transition of LTS built by ReX.fragment is reachable from start
+    for (from_, label), targets in delta.items():
+        if label:
+            labelled[from_].append((label, targets))
+            tokens.add(label)
+    # states, after reaching which some label can be read, and states, after reaching which chain can end
+    labelled_states = set(labelled)
+    continuable = {state for state, closure in closures.items() if not closure.isdisjoint(labelled_states)}
+    ending = {state for state, closure in closures.items() if end in closure}
+    new_delta: tp.Dict[tp.Tuple[int, str], tp.Dict[int, None]] = defaultdict(dict)
+    reachable = {start, end}
+    queue = [start]
+    while queue:
+        state = queue.pop()
+        for closure_state in closures[state] & labelled_states:
+            for label, targets in labelled[closure_state]:
+                for to in targets:
+                    if to in ending:
+                        new_delta[(state, label)][end] = None
+                    if to not in continuable:
+                        continue
+                    new_delta[(state, label)][to] = None
+                    if to not in reachable:
+                        reachable.add(to)
+                        queue.append(to)
+    order = [start] + sorted(reachable - {start, end}) + [end]
+    new_id = {state: start + ind for ind, state in enumerate(order)}
+    result = {(new_id[from_], label): [new_id[to] for to in targets] for (from_, label), targets in new_delta.items()}
+    if end in closures[start]:
+        result[(start, "")] = [new_id[end]]
+        tokens.add("")
+    return start, new_id[end], result, tokens
+
+
+def rex2lts(rexp: ReX, first_state=0, without_epsilon: bool = False) -> LTS:
     """
     Builds LTS from given regexp.
     States will be numbered as 0, .m.., len(states) - 1.
     First one is starting state, last one - ending state.
-    First_state is used to avoid collisions of states in recursive calls.
+    First_state is the number of the starting state.
+    Every symbol of regexp is a single label, even if it consists of several characters.
+    If without_epsilon is set, resulting LTS has no epsilon-transitions
+    except the one from start to end for regexps accepting empty string.
+    Such LTS has fewer states, but may have quadratically more transitions, so it isn't built by default.
     """
-    if isinstance(rexp, Epsilon) or isinstance(rexp, Symbol):
-        label = ""
-        if isinstance(rexp, Symbol):
-            label = rexp.value
-        start, end = first_state, first_state + 1
-        transitions = {Transition(start, label, end)}
-    elif isinstance(rexp, KleeneStar):
-        lts_inner = rex2lts(rexp.inner, first_state + 1)  # we reserve first state for start
-        start, end = first_state, lts_inner.end + 1
-        transitions = lts_inner.transitions
-        transitions.add(Transition(start, "", lts_inner.start))
-        transitions.add(Transition(lts_inner.end, "", end))
-        transitions.add(Transition(lts_inner.end, "", lts_inner.start))
-        transitions.add(Transition(lts_inner.start, "", lts_inner.end))
-    elif isinstance(rexp, Union):
-        lts_fir = rex2lts(rexp.first, first_state + 1)  # first state is for start
-        lts_sec = rex2lts(rexp.second, first_state + 1 + len(lts_fir.states))  # states from first lts are used already
-        start, end = first_state, lts_sec.end + 1
-        transitions = lts_fir.transitions
-        transitions.update(lts_sec.transitions)
-        transitions.add(Transition(start, "", lts_fir.start))
-        transitions.add(Transition(start, "", lts_sec.start))
-        transitions.add(Transition(lts_fir.end, "", end))
-        transitions.add(Transition(lts_sec.end, "", end))
-    elif isinstance(rexp, Concatenation):
-        lts_fir = rex2lts(rexp.first)
-        lts_sec = rex2lts(rexp.second, first_state + len(lts_fir.states))  # states from first lts are used already
-        start, end = lts_fir.start, lts_sec.end
-        transitions = lts_fir.transitions
-        transitions.update(lts_sec.transitions)
-        transitions.add(Transition(lts_fir.end, "", lts_sec.start))
-    else:
+    # every class of regexp builds its own fragment, so the builder is chosen by method lookup on type of rexp
+    if not isinstance(rexp, ReX):
         raise TypeError("Unknown regexp")
-    return LTS(start, end, range(start, end + 1), {x.lbl for x in transitions}, transitions)
+    start, end, delta = rexp.fragment(first_state)
+    if not without_epsilon:
+        return LTS(start, end, range(start, end + 1), {label for _, label in delta}, delta=delta)
+    start, end, delta, tokens = _remove_epsilon(start, end, delta)
+    return LTS(start, end, range(start, end + 1), tokens, delta=delta)
 
 
 def main():
     """
     examples and some checks for correct work
     """
+    import pickle
+    from copy import deepcopy
     a_lts = rex2lts(Symbol('a'))
+    try:
+        rex2lts("a")
+        assert False, "only regexps are converted"
+    except TypeError:
+        pass
     print(a_lts)  # start: 0, end: 1, transitions: {Transition(from_=0, lbl='a', to=1)}
     assert a_lts.accepts("a")
     assert not a_lts.accepts("b")
+    # transitions can be copied and pickled
+    assert deepcopy(a_lts).transitions == a_lts.transitions
+    assert pickle.loads(pickle.dumps(a_lts)).transitions == a_lts.transitions
     a_star = rex2lts(KleeneStar(Symbol("a")))
     assert a_star.accepts("")
     assert a_star.accepts("aaaa")
@@ -65,6 +101,11 @@ def main():
     aaaa_cat = rex2lts(Concatenation(KleeneStar(Symbol("a")), Symbol("cat")))
     assert aaaa_cat.accepts(["a", "a", "a", "cat"])
     assert not aaaa_cat.accepts(["a", "a", "b", "cat"])
+    # epsilon-transitions can be removed, except the one from start to end for regexps accepting empty string
+    ab_star_or_c = Union(KleeneStar(Concatenation(Symbol("a"), Symbol("b"))), Symbol("c"))
+    ab_star_or_c = rex2lts(ab_star_or_c, without_epsilon=True)
+    assert all(x.lbl or (x.from_, x.to) == (ab_star_or_c.start, ab_star_or_c.end) for x in ab_star_or_c.transitions)
+    assert len(ab_star_or_c.states) == 4
 
 
 if __name__ == "__main__":